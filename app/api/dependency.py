@@ -1,7 +1,6 @@
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from app.models.user import User
 from app.core.config import settings
 from fastapi import Request
@@ -22,7 +21,6 @@ async def get_stripe_client(request: Request) -> StripeClient:
     return request.app.state.stripe_client
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -199,19 +199,21 @@ async def send_session_v2(
             )
             .order_by("distance")
             .limit(10)
+            .values_list("id", "sender", "content")
         )
-        similar_messages_ids = [msg.id for msg in similar_messages]
+        similar_messages_ids = [msg_id for msg_id, _, _ in similar_messages]
+        # Plain (sender, content) rows: no model instances, and no embedding
+        # vectors loaded just to be thrown away
         last_few_messages = (
             await ChatMessage.filter(session_id=session_id)
             .exclude(id__in=similar_messages_ids)
             .order_by("-created_at")
             .limit(5)
+            .values_list("sender", "content")
         )
         context_messages = [
-            {"sender": msg.sender, "text": msg.content} for msg in last_few_messages
-        ]
-        context_messages = context_messages + [
-            {"sender": msg.sender, "text": msg.content} for msg in similar_messages
+            *last_few_messages,
+            *((sender, text) for _, sender, text in similar_messages),
         ]
         messages = helpers.build_post_diagnosis_prompt(
             user={"name": user.full_name},
@@ -220,12 +222,15 @@ async def send_session_v2(
             recommendations=session.recommendations or {},
             current_message=message,
             previous_messages=context_messages,
+            findings_md=session.findings_md,
+            recommendations_md=session.recommendations_md,
         )
         response = await openai_client.chat.completions.create(
             model="gpt-4.1",
             messages=messages,
             temperature=0.2,
-            response_format={"type": "json_object"},
+            response_format=premium_helpers.POST_DIAGNOSIS_RESPONSE_FORMAT,
+            extra_body={"prompt_cache_key": premium_helpers.prompt_cache_key(session_id)},
         )
         await Usage.bulk_create(total_usage)
 
@@ -240,7 +245,14 @@ async def send_session_v2(
         report = ai_response.get("report", {})
         report_title = ai_response.get("report_title", {})
         if updated_recs:
-            await ChatSession.filter(id=session_id).update(recommendations=updated_recs)
+            await ChatSession.filter(id=session_id).update(
+                recommendations=updated_recs,
+                recommendations_md=(
+                    premium_helpers.format_recommendations_md(updated_recs)
+                    if isinstance(updated_recs, dict)
+                    else session.recommendations_md
+                ),
+            )
 
         ai_message = await ChatMessage.create(
             session_id=session_id,
@@ -303,7 +315,6 @@ async def send_session_v2(
         file_data = [
             ChatImage(
                 message_id=chat_message.id,
-                img_base64=file["base64_data"],
                 filename=file["filename"],
                 file_type=file["file_type"],
                 s3_url=file["s3_url"],
@@ -316,16 +327,12 @@ async def send_session_v2(
 
     build_pmt_st = time.time()
 
-    prev_messages = (
+    prev_message_data = (
         await ChatMessage.filter(session_id=session_id, is_relevant=True)
         .exclude(id=chat_message.id)
         .order_by("id")
+        .values_list("id", "sender", "content")
     )
-
-    prev_message_data = [
-        {"id": msg.id, "sender": msg.sender, "text": msg.content}
-        for msg in prev_messages
-    ]
     current_message_data = (
         {
             "id": chat_message.id,
@@ -352,6 +359,7 @@ async def send_session_v2(
         messages=messages,
         temperature=0.2,
         response_format={"type": "json_object"},
+        extra_body={"prompt_cache_key": premium_helpers.prompt_cache_key(session_id)},
     )
 
     try:
@@ -367,9 +375,24 @@ async def send_session_v2(
     if backend.get("is_diagnosed"):
         print("Entered Diagnosed")
         await ChatMessage.filter(session_id=session_id).update(is_relevant=False)
+        findings = backend.get("findings")
+        recommendations = backend.get("recommendations")
+        # The diagnosis reply's shape isn't enforced by a schema; if the model
+        # sends something other than an object, keep the previous rendering
+        # rather than failing after the reply has been generated
         await ChatSession.filter(id=session_id).update(
-            findings=backend.get("findings"),
-            recommendations=backend.get("recommendations"),
+            findings=findings,
+            findings_md=(
+                premium_helpers.format_findings_md(findings)
+                if isinstance(findings, dict)
+                else session.findings_md
+            ),
+            recommendations=recommendations,
+            recommendations_md=(
+                premium_helpers.format_recommendations_md(recommendations)
+                if isinstance(recommendations, dict)
+                else session.recommendations_md
+            ),
             is_diagnosed=True,
             recommendations_notified_at=datetime.now(timezone.utc),
             title=backend.get("session_title"),
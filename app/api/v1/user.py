@@ -13,9 +13,9 @@ from app.schemas.users import (
 from app.services.email_service import send_email
 from app.models.user import User
 from app.utils.helpers import (
-    verify_password,
+    verify_password_async,
     create_access_token,
-    get_password_hash,
+    get_password_hash_async,
     generate_token,
     generate_secret_key,
 )
@@ -98,7 +98,7 @@ async def login(form: UserLogin):
     user = await User.get_or_none(email=form.email)
     if user is None:
         raise HTTPException(400, "User with this email does not exists")
-    if not verify_password(form.password, user.password):
+    if not await verify_password_async(form.password, user.password):
         raise HTTPException(401, "Invalid Password")
     if not user.is_verified:
         raise HTTPException(403, "Email not verified")
@@ -118,9 +118,9 @@ async def me(current_user: User = Depends(get_current_user)):
 
 @router.put("/change-password")
 async def change_password(form: ChangePassword, user: User = Depends(get_current_user)):
-    if not verify_password(form.old_password, user.password):
+    if not await verify_password_async(form.old_password, user.password):
         raise HTTPException(400, "Old password incorrect")
-    user.password = get_password_hash(form.new_password)
+    user.password = await get_password_hash_async(form.new_password)
     user.secret_key = generate_secret_key()
     await user.save()
     access_token = create_access_token(
@@ -157,7 +157,7 @@ async def reset_password(form: ResetPassword):
     user = await User.get_or_none(reset_token=form.token)
     if user is None:
         raise HTTPException(400, "Invalid token")
-    user.password = get_password_hash(form.new_password)
+    user.password = await get_password_hash_async(form.new_password)
     user.reset_token = None
     user.secret_key = generate_secret_key()
     await user.save()
@@ -30,6 +30,13 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
     SITE_DOMIN: str = Field(default="http://127.0.0.1:8000", env="SITE_DOMIN")
     OPENAI_VECTOR_SIZE: int = 1536
+    # bcrypt work factor for new password hashes; 12 matches passlib's default
+    BCRYPT_ROUNDS: int = Field(default=12, env="BCRYPT_ROUNDS")
+    # Dev/test only: memoize password hashes so seeding doesn't re-bcrypt
+    # identical passwords. Never enable in production.
+    SPINEAI_UNSAFE_HASH_CACHE: bool = Field(
+        default=False, env="SPINEAI_UNSAFE_HASH_CACHE"
+    )
 
     # Email settings
     SMTP_HOST: str = Field(default="smtp.gmail.com", env="SMTP_HOST")
@@ -1,8 +1,15 @@
 from tortoise import fields, models
 
 
-class BaseModelWithoutID(models.Model):
+class BaseModelCreatedOnly(models.Model):
+    # For append-only tables whose rows are never updated
     created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+class BaseModelWithoutID(BaseModelCreatedOnly):
     updated_at = fields.DatetimeField(auto_now=True)
 
     class Meta:
@@ -1,17 +1,23 @@
 from tortoise import fields
-from app.models.base import BaseModelWithoutID
+from app.models.base import BaseModelCreatedOnly, BaseModelWithoutID
 from app.core.config import settings
 from tortoise_vector.field import VectorField
+from app.utils.helpers import uuid7
 
 
 class ChatSession(BaseModelWithoutID):
-    id = fields.UUIDField(primary_key=True)
+    # Time-ordered ids keep session inserts at the end of the primary key index
+    id = fields.UUIDField(primary_key=True, default=uuid7)
     user = fields.ForeignKeyField("models.User", related_name="chat_sessions")
     title = fields.TextField(null=True)
     findings = fields.JSONField(null=True)
+    # Markdown renderings of findings/recommendations, written alongside the
+    # JSON so post-diagnosis turns don't re-format them on every message
+    findings_md = fields.TextField(null=True)
     image_summary = fields.JSONField(null=True)
     detected_region = fields.CharField(max_length=255, null=True)
     recommendations = fields.JSONField(null=True)
+    recommendations_md = fields.TextField(null=True)
     suggested_product_tags = fields.JSONField(null=True)
     recommendations_notified_at = fields.DatetimeField(null=True)
     is_diagnosed = fields.BooleanField(default=False)
@@ -49,7 +55,6 @@ class GeneratedReport(BaseModelWithoutID):
 class ChatImage(BaseModelWithoutID):
     id = fields.IntField(pk=True)
     message = fields.ForeignKeyField("models.ChatMessage", related_name="chat_images")
-    img_base64 = fields.TextField()
     file_type = fields.CharField(max_length=10, null=True)
     meta_data = fields.JSONField(null=True)
     filename=fields.TextField(null=True)
@@ -59,9 +64,6 @@ class ChatImage(BaseModelWithoutID):
     class Meta:
         table = "images"
 
-    class PydanticMeta:
-        exclude = ("img_base64",)
-
     
 class UserUploadedFile(BaseModelWithoutID):
     id = fields.IntField(pk=True)
@@ -78,7 +80,7 @@ class UserUploadedFile(BaseModelWithoutID):
     class PydanticMeta:
         exclude = ("user", "message")
 
-class Usage(BaseModelWithoutID):
+class Usage(BaseModelCreatedOnly):
     id = fields.IntField(pk=True)
     usage_type =fields.CharField(max_length=10)
     user = fields.ForeignKeyField("models.User", related_name="usage")
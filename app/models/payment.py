@@ -1,5 +1,5 @@
 from tortoise import fields
-from app.models.base import BaseModelWithoutID
+from app.models.base import BaseModelCreatedOnly, BaseModelWithoutID
 
 
 class Plan(BaseModelWithoutID):
@@ -22,7 +22,7 @@ class Plan(BaseModelWithoutID):
         return self.name
 
 
-class PendingEvent(BaseModelWithoutID):
+class PendingEvent(BaseModelCreatedOnly):
     id = fields.CharField(max_length=255, pk=True)
     type = fields.CharField(max_length=255)
     created = fields.DatetimeField()
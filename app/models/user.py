@@ -3,7 +3,7 @@ from tortoise import fields
 from app.models.base import BaseModelWithoutID
 from app.models.payment import Plan
 from app.models.chat import Usage
-from app.utils.helpers import get_password_hash, generate_token, generate_secret_key, get_month_range
+from app.utils.helpers import get_password_hash_async, generate_token, generate_secret_key, get_month_range
 import asyncio
 import logging
 from datetime import datetime, timezone
@@ -103,7 +103,7 @@ class User(BaseModelWithoutID):
 
     async def save(self, *args, **kwargs):
         if not self.pk:
-            self.password = get_password_hash(self.password)
+            self.password = await get_password_hash_async(self.password)
             self.verification_token = generate_token()
         await super().save(*args, **kwargs)
 
@@ -11,7 +11,7 @@ from app.models.treatment_plan import TreatmentCategory, WeeklyPlan, Task
 from app.models.user import User
 from app.core.config import settings
 from openai import AsyncClient
-from app.utils.helpers import generate_treatment_plan_prompt
+from app.utils.helpers import generate_treatment_plan_prompt_async
 from app.services.email_service import send_email
 from datetime import date
 
@@ -162,7 +162,7 @@ async def async_db_treatment_per_session(session_id):
         session = await ChatSession.get_or_none(id=session_id)
         if not session:
             raise ValueError("Session not found")
-        message = generate_treatment_plan_prompt(
+        message = await generate_treatment_plan_prompt_async(
             findings=session.findings,
             recommendations=session.recommendations,
             date=datetime.now().strftime("%Y-%m-%d"),
@@ -1,69 +1,161 @@
 from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
 import jwt, json
-from passlib.context import CryptContext
+import bcrypt
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
+from app.utils.prompts import load_prompt
+import os
 import secrets
-import random
-from typing import List, Dict, Optional
+import time
+from base64 import urlsafe_b64encode
+from functools import cache, lru_cache
+from typing import Final, List, Dict, Optional, Tuple
+from uuid import UUID
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+_JWT_SECRET_KEY = settings.JWT_SECRET_KEY
+_JWT_ALGORITHM = settings.ALGORITHM
+
+# Static system prompts, read once per process from app/utils/prompts
+_SPINE_SYSTEM_PROMPT: Final = load_prompt("spine_system.md")
+_SPINE_SYSTEM_MESSAGE: Final = {"role": "system", "content": _SPINE_SYSTEM_PROMPT}
+# Leading newline keeps a blank line between it and the current input
+_SPINE_OUTPUT_FORMAT: Final = "\n" + load_prompt("spine_output_format.md")
+_POST_DIAGNOSIS_SYSTEM_PROMPT: Final = load_prompt("post_diagnosis_system.md")
+# Fully static so every user shares one cacheable prefix; per-request values
+# such as the date belong in the user message.
+_POST_DIAGNOSIS_SYSTEM_MESSAGE: Final = {
+    "role": "system",
+    "content": _POST_DIAGNOSIS_SYSTEM_PROMPT,
+}
+# Reply shape for both post-diagnosis prompts, enforced by the API through
+# Structured Outputs instead of a JSON template in the system prompt
+POST_DIAGNOSIS_RESPONSE_FORMAT: Final = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "spineai_reply",
+        "strict": True,
+        "schema": json.loads(load_prompt("post_diagnosis_response_schema.json")),
+    },
+}
+
+
+# bcrypt only reads the first 72 bytes; passlib truncated silently and newer
+# bcrypt releases raise instead, so truncate here to keep existing logins valid.
+_BCRYPT_MAX_BYTES = 72
+
+
+@cache
+def _dummy_hash() -> bytes:
+    # Built on first use rather than at import so workers that never verify
+    # a password don't pay a bcrypt round on startup.
+    return bcrypt.hashpw(b"x", bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS))
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    # Hashes written by passlib's bcrypt handler use the same modular-crypt
+    # format, so existing users keep verifying against the bcrypt library.
+    password = plain_password.encode()[:_BCRYPT_MAX_BYTES]
+    try:
+        return bcrypt.checkpw(password, hashed_password.encode())
+    except ValueError:
+        # Malformed stored hash: still pay one bcrypt round so the response
+        # time doesn't reveal it, then reject.
+        bcrypt.checkpw(password, _dummy_hash())
+        return False
+
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(
+        password.encode()[:_BCRYPT_MAX_BYTES],
+        bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS),
+    ).decode()
+
+
+@lru_cache(maxsize=128)
+def _cached_password_hash(password: str) -> str:
+    return _hash_password(password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    """
+    Hashes a password with bcrypt.
+
+    When SPINEAI_UNSAFE_HASH_CACHE is set, hashes are memoized per plaintext so
+    seed scripts and test fixtures pay the bcrypt cost once per unique password.
+    This is unsafe outside dev/test: identical passwords share one salt and hash,
+    which defeats per-user salting. Production must leave the flag unset.
+    """
+    if settings.SPINEAI_UNSAFE_HASH_CACHE:
+        return _cached_password_hash(password)
+    return _hash_password(password)
+
+
+# bcrypt releases the GIL while hashing, so worker threads give real
+# parallelism here and keep the event loop free during the key schedule.
+async def verify_password_async(plain_password, hashed_password):
+    """Runs verify_password in a worker thread, off the event loop."""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password):
+    """Runs get_password_hash in a worker thread, off the event loop."""
+    return await asyncio.to_thread(get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
+    # Callers pass a fresh claims dict, so "exp" is set on it in place
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-        to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM
-    )
-    return encoded_jwt
+        data["exp"] = datetime.now(timezone.utc) + expires_delta
+    return jwt.encode(data, _JWT_SECRET_KEY, algorithm=_JWT_ALGORITHM)
 
 
-def generate_token(length=32):
-    return secrets.token_urlsafe(length)
+def generate_token(length: int = 32) -> str:
+    # `length` is bytes of entropy; the URL-safe text is about 1.3x longer.
+    # Same output as secrets.token_urlsafe, minus its wrapper calls.
+    return urlsafe_b64encode(os.urandom(length)).rstrip(b"=").decode("ascii")
 
 
-def get_month_range(given_date: datetime = datetime.now(timezone.utc)):
+def uuid7() -> UUID:
+    """
+    Returns a time-ordered UUID (RFC 9562 version 7).
+
+    The leading 48 bits are the Unix time in milliseconds, so new primary keys
+    land on the right-hand edge of the B-tree instead of random leaf pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10))
+    # Stamp version 7 and the RFC 4122 variant over the random bits
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return UUID(int=value)
+
+
+def get_month_range(given_date: Optional[datetime] = None):
+    # Default to "now" at call time; a default argument would be frozen at import
+    if given_date is None:
+        given_date = datetime.now(timezone.utc)
     # Ensure the given date is timezone-aware; if not, assume UTC
-    if given_date.tzinfo is None:
-        given_date = given_date.replace(tzinfo=timezone.utc)
+    tz = given_date.tzinfo or timezone.utc
 
-    # Start of the current month
-    start_of_month = given_date.replace(
-        day=1, hour=0, minute=0, second=0, microsecond=0
-    )
+    year, month = given_date.year, given_date.month
+    # Positional construction skips .replace()'s keyword handling
+    start_of_month = datetime(year, month, 1, 0, 0, 0, 0, tz)
 
     # Handle December separately to roll over the year
-    if given_date.month == 12:
-        start_of_next_month = given_date.replace(
-            year=given_date.year + 1,
-            month=1,
-            day=1,
-            hour=0,
-            minute=0,
-            second=0,
-            microsecond=0,
-        )
+    if month == 12:
+        start_of_next_month = datetime(year + 1, 1, 1, 0, 0, 0, 0, tz)
     else:
-        start_of_next_month = given_date.replace(
-            month=given_date.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0
-        )
+        start_of_next_month = datetime(year, month + 1, 1, 0, 0, 0, 0, tz)
 
     return start_of_month, start_of_next_month
 
 
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+
 def format_file_size(size_in_bytes: int) -> str:
     """
     Formats a file size (in bytes) into a human-readable string
@@ -77,324 +169,143 @@ def format_file_size(size_in_bytes: int) -> str:
     """
     if size_in_bytes < 0:
         return "Invalid Size"
-    units = ["B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB"]
-    threshold = 1024.0
-
-    for i, unit in enumerate(units):
-        if size_in_bytes < threshold:
-            if i == 0:
-                return f"{size_in_bytes} {unit}"
-            return f"{size_in_bytes:.2f} {unit}"
-        size_in_bytes /= threshold
-    return f"{size_in_bytes:.2f} {units[-1]} (Extremely Large)"
+    if size_in_bytes < 1024:
+        return f"{size_in_bytes} B"
+    # Each unit is 2**10 times the previous one, so the bit length picks it
+    # directly instead of dividing down in a loop.
+    idx = (size_in_bytes.bit_length() - 1) // 10
+    if idx >= len(_SIZE_UNITS):
+        return f"{size_in_bytes / (1 << 90):.2f} {_SIZE_UNITS[-1]} (Extremely Large)"
+    return f"{size_in_bytes / (1 << (idx * 10)):.2f} {_SIZE_UNITS[idx]}"
 
 
 def generate_secret_key() -> str:
-    return str(random.randint(100000, 99999999)).zfill(8)
+    # Same 100000..99999999 range as before, drawn from the OS CSPRNG
+    return f"{100_000 + secrets.randbelow(99_900_000):08d}"
+
+
+@lru_cache(maxsize=512)
+def _title(key: str) -> str:
+    # Findings/recommendation keys come from a small, repeating vocabulary
+    return key.replace("_", " ").title()
+
+
+# Display label per message sender; anything that isn't the user is the AI
+_SENDER_PREFIX = {"user": "User"}
+
+
+def _findings_dict(buf: List[str], title: str, value: Dict) -> None:
+    buf.append(f"### 🦴 {title}")
+    if any(isinstance(v, (dict, list)) for v in value.values()):
+        # Deeper nesting would otherwise be rendered as Python reprs; a fenced
+        # JSON block reads just as well to the model.
+        buf.append(f"```json\n{json.dumps(value, indent=2, ensure_ascii=False)}\n```")
+    else:
+        buf.extend(f"- {_title(k)}: {v}" for k, v in value.items())
+
+
+def _findings_list(buf: List[str], title: str, value: List) -> None:
+    buf.append(f"### 📌 {title}")
+    buf.extend(f"- {v}" for v in value)
+
+
+def _findings_str(buf: List[str], title: str, value: str) -> None:
+    buf.append(f"### 📌 {title}\n- {value}")
+
+
+# Findings are decoded JSON, so values are exactly dict/list/str; other types
+# are skipped.
+_FINDINGS_HANDLERS = {dict: _findings_dict, list: _findings_list, str: _findings_str}
+
+
+def format_findings_md(findings: Dict) -> str:
+    buf = []
+    handlers = _FINDINGS_HANDLERS
+    for key, value in findings.items():
+        handler = handlers.get(type(value))
+        if handler is not None:
+            handler(buf, _title(key), value)
+    return "\n".join(buf) or "No diagnosis data available."
+
+
+def _recommendations_list(values: List) -> str:
+    return "\n".join(f"   - {v}" for v in values) if values else "   - None provided"
+
+
+def _recommendations_str(values: str) -> str:
+    return f"   - {values}" if values.strip() else "   - None provided"
+
+
+def _recommendations_unknown(values) -> str:
+    return "   - Unknown format"
+
+
+# Same exact-type dispatch as the findings handlers above
+_RECOMMENDATION_HANDLERS = {list: _recommendations_list, str: _recommendations_str}
+
+
+def format_recommendations_md(recommendations: Dict) -> str:
+    if not recommendations:
+        return "No previous recommendations available."
+    handlers = _RECOMMENDATION_HANDLERS
+    # Every key yields exactly one entry, so build the list in one comprehension
+    return "\n".join(
+        [
+            f"- {_title(key)}:\n"
+            f"{handlers.get(type(values), _recommendations_unknown)(values)}"
+            for key, values in recommendations.items()
+        ]
+    )
 
 
 def build_spine_diagnosis_prompt(
     current_message: str = None,  # {"id": int, "text": str}
     previous_messages: Optional[
-        List[Dict]
-    ] = None,  # [{"id": int, "sender": str, "text": str}]
+        List[Tuple[int, str, str]]
+    ] = None,  # [(id, sender, text)], e.g. from values_list("id", "sender", "content")
     images_summary: Optional[
         List[str]
     ] = None,  # List of strings, e.g., ["Summary of Image 1", "Summary of Image 2"]
     new_images: Optional[List[Dict]] = None,  # [{"image_id": int, "url": str}]
 ) -> List[Dict]:
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a medical assistant AI specializing in spine-related issues. "
-                "You diagnose conditions using X-ray/MRI images and patient-provided symptoms. "
-                "If asked about your model or name, simply respond 'Spine AI'. "
-                "Never provide a direct diagnosis without gathering sufficient information through a structured questioning process.\n\n"
-                "You will receive the following:\n"
-                "- Prior patient messages.\n"
-                "- A detailed summary of previously uploaded images (for context).\n"
-                "- The latest input, which may include new text and/or images.\n\n"
-                "Your core objective is to guide the patient through a diagnostic process similar to a medical consultation. "
-                "Achieve this by asking one to two precise questions at a time to collect all necessary information before offering any analysis or diagnosis.\n\n"
-                "--- Pre-Diagnosis Flow ---\n"
-                "Image Summary Management: After receiving an image, create a detailed internal summary for your own reference. Do not miss even 1 detial not matter if the image is in vertical or horizontal. Lossing even 1 detail can change the whole diagnosis so extract every detail from the images."
-                "This summary is for contextual understanding and should never be shown to the user directly, but will be returned in the images_summary JSON field for your internal state. "
-                "Each summary string MUST start with 'Image ID [Unique_Image_ID] ([Modality], [Region]): Overall impression: [Impression]. Findings: [Comma-separated detailed findings]. Keywords: [Comma-separated keywords].' This [Unique_Image_ID] should correspond to the 'Image ID' provided in the user's input for newly uploaded images. You should append new summaries to this list or update existing ones if new information about a specific image comes to light. "
-                "DO NOT append or update the summary if multiple spine regions are detected as per core constraint."
-                "Ensure no duplicate 'Image ID' summaries exist in the list; if a summary for an 'Image ID' already exists, update it. "
-                "If an image is irrelevant to spine conditions, do not include it in the images_summary list. "
-                "(For simple greetings like 'Hi', a summary update is not necessary.)\n\n"
-                "--- Core Constraint: One Primary Spine Region Per Session ---\n"
-                "Spnine has three regions (e.g., Cervical, Thoracic, Lumbar). One session will only contain one region. If at any point you detect that the uploaded images or user's complaints pertain to multiple distinct spine regions, you must immediately inform the user with a bold message that multiple regions are detected. Instruct them to initiate new sessions for each region. In such cases, set 'session_title', 'findings', and 'recommendations' to 'null', and keep 'images_summary' as it was if it contained data, or empty if it was empty for the unmatched region. do not add any new summary to it too. Do not proceed with the diagnostic flow for the current session.\n\n"
-                "Phase 1: Clinical Intake (One to Two Questions at a Time)\n"
-                "Your primary role is to gather relevant medical information by asking focused, single or dual questions.\n"
-                "Important Rules for Intake:\n"
-                "- Ask only one or two questions at a time.\n"
-                "- Make the questions text bold and other important part of the response bold.\n"
-                "- Make sure that the questions are in seperate lines. Don't put 2 questions in 1 line.\n"
-                "- Await a clear response from the user before posing the next question.\n"
-                "- If a question is unanswered or skipped, gently rephrase or ask it again.\n"
-                "- After analyzing any image, you must state the findings once (immediately after receiving the image) and again during the final diagnosis.\n"
-                "- If a necessary medical image is missing, explicitly request it before proceeding. **Always ask for a clear and high-resolution image (X-ray or MRI) for the most accurate findings.**\n"
-                "- Crucially, do not attempt to analyze or diagnose until all required information has been collected through your questions.\n"
-                "- Avoid redundant questions; meticulously track the intake session's context.\n\n"
-                "You must gather at least one or two clear answers from each of the following categories before moving to diagnosis:\n"
-                "- Symptoms: (e.g., 'What symptoms are you experiencing?', 'Where exactly do you feel the pain?')\n"
-                "- Imaging and Reports: (e.g., 'Do you have prior reports or scans like X-rays, MRI, or CT scans?', 'Please upload any medical images or documents you have.')\n"
-                "- Previous Consultations: (e.g., 'Have you seen a doctor for this issue before?', 'What was your previous doctor's assessment or advice?')\n"
-                "- Medical History: (e.g., 'Do you have any relevant past medical conditions or surgeries?', 'Are you currently taking any medications?')\n"
-                "- Lifestyle Factors: (e.g., 'Are there any specific activities or lifestyle habits that worsen or improve your symptoms?', 'How has this condition impacted your daily life?')\n\n"
-                "Specifically, you must wait for the user to provide sufficient data by answering your questions. Never attempt to identify their condition until the following are available:\n"
-                "- Patient history or complaints (e.g., Symptoms, Medical History, Lifestyle Factors).\n"
-                "- Medical images (X-ray, MRI, etc.).\n"
-                "- Optional: Previous doctor's notes, reports, or prescriptions.\n\n"
-                "Based on uploaded reports or initial symptoms, ask relevant follow-up questions (e.g., pain scale, duration, trauma history) one or two at a time.\n\n"
-                "Phase 2: Identification of Condition (Once sufficient information is available)\n"
-                "Once you have gathered all necessary information (e.g., symptoms, history, and clear images):\n"
-                "- Interpret the uploaded medical images with maximum precision .\n"
-                "- Correlate imaging findings with the symptoms and patient history.\n"
-                "- Provide a structured report outlining the identified condition. This report must include:\n"
-                "  - Modality: (e.g., X-ray, MRI, CT).\n"
-                "  - Area of Scan: (e.g., Lumbar Spine, Cervical Spine).\n"
-                "  - Findings: (Objective observations).\n"
-                "  - Impression: (A concise summary of the findings, leading to the identified condition).\n"
-                "  - Recommendations: (e.g., referrals, next steps, self-care advice). Recommendations should cover:\n"
-                "    - Exercise and movement therapy.\n"
-                "    - Pain relief strategies.\n"
-                "    - Ice and heat application.\n"
-                "    - Inflammation management.\n"
-                "    - Lifestyle adjustments.\n"
-                "    - Specific therapies.\n"
-                "    - Breathing and core techniques.\n"
-                "    - Daily habits.\n"
-                "    - Natural remedies for strength and recovery.\n\n"
-                "--- Medical Analysis & General AI Protocol ---\n"
-                "For every image you analyze, include the following structured output (within the JSON 'user' markdown):\n"
-                "Do not use the word 'diagnosis'. Instead, use 'identify your condition' or similar phrasing.\n"
-                "Imaging Modality: (X-ray, MRI, etc.)\n"
-                "Region/Area Scanned: (e.g., Lumbar Spine, Chest)\n"
-                "Findings: Describe abnormalities, if any (e.g., 'disc herniation at L4-L5', 'loss of cervical lordosis').\n"
-                "Impression: A clear summary (e.g., 'Mild degenerative disc disease').\n"
-                "Recommendations: Further tests, specialist referral, treatment options, etc.\n"
-                "\n\n"
-                "Example structured output for image analysis:\n"
-                "\n"
-                "Imaging Modality: X-ray\n"
-                "Region Scanned: Cervical Spine\n"
-                "Findings:\n"
-                "- Loss of normal cervical lordosis\n"
-                "- Mild narrowing of the C5-C6 intervertebral disc space\n"
-                "- No evidence of fracture or dislocation\n"
-                "Impression:\n"
-                "Early degenerative changes in the cervical spine, likely consistent with spondylosis.\n"
-                "Recommendations:\n"
-                "- Consider MRI for detailed evaluation if symptoms persist\n"
-                "- Physical therapy and posture correction advised\n"
-                "- Neurology referral if neurological deficits are present\n"
-                "\n\n"
-                "--- Abnormalities to Identify (Use these terms first) ---\n"
-                "**George's Line Analysis:** George's Line (or posterior Body Line) is a curved line that should touch the posterior body margin of all the segments of the spine in any of the 3 main curvatures. The back of the vertebrae should line up and not be off the line of the vertebral bodies. This line helps identify two major issues with the spine:\n"
-                "1. Spondylolisthesis: This is a condition where the body of the vertebral body is moved forward off that line. Typically means there is a defect of the pars of the vertebral body.\n"
-                "2. The hypermobile segment is due to ligament damage. This will demonstrate if the patient would be considered for fusion surgery. If the movement changes too much, the segment is considered unstable and needs to be determined if the segment should be fused to the one below or above, or both. Also, we measure the angulation of the disc space for the same purpose. Meaning if the disc space creates too big a wedge when we do an extension/flexion x-ray, then the ligaments are compromised.\n"
-                "\n"
-                "A disruption in this line, such as a step-off, is a critical finding that may require surgical intervention. If you detect a disruption of George's Line in any region, you MUST immediately escalate the situation with a direct and urgent recommendation for a surgical consultation.\n"
-                "\n"
-                "You must identify abnormalities using, but not limited to, the following terms:\n"
-                "\n"
-                "Cervical Spine (Neck) Findings:\n"
-                "- **Disruption of George's Line (significant instability)**\n"
-                "- Loss of cervical lordosis (straightened neck)\n"
-                "- Reversal of cervical curve\n"
-                "- Cervical kyphosis (forward curve)\n"
-                "- Anterolisthesis or retrolisthesis (vertebra shifted forward/back)\n"
-                "- Atlantoaxial instability (instability between C1 and C2)\n"
-                "- Vertebral rotation or malposition\n"
-                "- Disc space narrowing\n"
-                "- Uncovertebral joint degeneration\n"
-                "- Facet joint hypertrophy\n"
-                "- Osteophyte formation (bone spurs)\n"
-                "- Degenerative disc disease (DDD)\n"
-                "- Vertebral body wedging (possible trauma)\n"
-                "- Sclerosis or endplate irregularity\n"
-                "- Jefferson fracture (C1)\n"
-                "- Odontoid fracture (C2)\n"
-                "- Hangman's fracture (C2)\n"
-                "- Spinous process fractures\n"
-                "- Prevertebral soft tissue swelling\n"
-                "- Ossification of the posterior longitudinal ligament (OPLL)\n"
-                "- Lytic or blastic lesions (possible tumors)\n"
-                "- Block vertebra (e.g., C2-C3)\n"
-                "- Spina bifida occulta\n"
-                "- Cervical ribs\n\n"
-                "Thoracic Spine (Mid-Back) Findings:\n"
-                "- **Disruption of George's Line (significant instability)**\n"
-                "- Abnormal kyphosis (increased forward curve)\n"
-                "- Gibbus deformity (sharp kyphotic angle)\n"
-                "- Scoliosis (sideways curve)\n"
-                "- Vertebral malalignment\n"
-                "- Disc space narrowing\n"
-                "- Endplate irregularities\n"
-                "- Schmorl's nodes (disc material pushed into vertebra)\n"
-                "- Compression fractures\n"
-                "- Osteophyte formation\n"
-                "- Vertebral body wedging\n"
-                "- Costovertebral joint degeneration\n"
-                "- Ankylosis (e.g., ankylosing spondylitis)\n"
-                "- Burst fracture\n"
-                "- Wedge compression fracture\n"
-                "- Spinous or transverse process fractures\n"
-                "- Calcified aorta\n"
-                "- Paraspinal line abnormalities\n"
-                "- Lytic or blastic lesions\n"
-                "- Infection signs (discitis, osteomyelitis)\n"
-                "- Hemivertebra\n"
-                "- Block vertebra\n\n"
-                "Lumbar Spine (Lower Back) Findings:\n"
-                "- **Disruption of George's Line (significant instability)**\n"
-                "- Loss or reversal of lumbar lordosis\n"
-                "- Scoliosis\n"
-                "- Spondylolisthesis (vertebra shifted forward/back)\n"
-                "- Vertebral rotation\n"
-                "- Pelvic tilt or leg length discrepancy\n"
-                "- Disc space narrowing\n"
-                "- Vacuum phenomenon (gas in disc space)\n"
-                "- Endplate sclerosis or irregularity\n"
-                "- Facet joint hypertrophy or degeneration\n"
-                '- Pars defect (spondylolysis, "Scottie dog" sign)\n'
-                "- Osteophyte formation\n"
-                "- Vertebral body wedging\n"
-                "- Schmorl's nodes\n"
-                "- Osteopenia or osteoporosis\n"
-                "- Compression fractures\n"
-                "- Burst fractures\n"
-                "- Transverse or spinous process fractures\n"
-                "- Abdominal aortic calcification\n"
-                "- Lytic or blastic lesions (possible tumors)\n"
-                "- Discitis or endplate erosion\n"
-                "- Transitional vertebra (lumbarization/sacralization)\n"
-                "- Spina bifida occulta\n"
-                "- Block vertebra\n\n"
-                "--- Important Safety & Recommendation Guidelines ---\n"
-                "**URGENT SAFETY PROTOCOL:** If 'Disruption of George's Line' is a finding, you MUST immediately inform the user that this indicates a potentially serious condition of spinal instability. You must recommend they seek urgent evaluation from a spine surgeon and set the 'multiple_region_detected' flag to true to immediately terminate the current session's diagnostic flow, as this condition is beyond a simple AI consultation."
-                "- Only suggest exercise, movement therapy, pain relief, ice & heat, inflammation management, lifestyle adjustments, therapies, breathing & core techniques, daily habits, and natural remedies "
-                "after asking sufficient questions, understanding the user's condition, and performing an 'identification of condition'.\n"
-                "- Use empathetic, simple, and printable/downloadable language.\n"
-                "- Never provide real medical diagnoses. Always state that you are an AI after identifying the condition.\n"
-                "- After identifying the condition, always include: 'This is not a substitute for professional medical advice. Please consult a licensed doctor.'\n"
-                "- If image quality is insufficient or if you can't be at least 95 percent sure about what's in the image (e.g., blurry, low-resolution, or the wrong type of scan for the issue), you **must** inform the user that you cannot proceed safely and explicitly request a clearer, higher-resolution image. Your response should be: **'I cannot safely analyze the provided image due to its poor quality. Please upload a clearer, higher-resolution X-ray or MRI image so I can proceed with the analysis.'**\n"
-                "- If any required information is missing or image quality is poor, inform the user that you cannot proceed safely until that information is provided."
-            ),
-        }
-    ]
+    # Shared module-level dict; downstream only appends to the list
+    messages = [_SPINE_SYSTEM_MESSAGE]
 
-    # 🗣 2. User message + previous history
-    user_message_block = {"role": "user", "content": []}
+    # 🗣 2. User message: all text goes into one part, images follow as their own
+    parts = []
 
     # Add images summary if available
     # The AI will see this list of detailed summaries for previous images
     if images_summary:
-        user_message_block["content"].append(
-            {
-                "type": "text",
-                # Pass the list of strings for AI to process and determine primary region
-                "text": f"## Previous Images Summary:\n{", ".join(images_summary)}\n\n",
-            }
-        )
-
-    # Session & prior messages
-    user_message_block["content"].append(
-        {"type": "text", "text": f"## Previous Messages:\n"}
-    )
+        parts.append(f"## Previous Images Summary:\n{", ".join(images_summary)}\n")
 
+    # Session & prior messages, one line each, joined with the rest below
+    parts.append("## Previous Messages:")
     if previous_messages:
-        for msg in previous_messages:
-            prefix = "User" if msg["sender"] == "user" else "System"
-            user_message_block["content"].append(
-                {
-                    "type": "text",
-                    "text": f"- [{prefix} msg_id {msg['id']}] {msg['text']}",
-                }
-            )
-
-    # 🖼 New images
-    if new_images:
-        user_message_block["content"].append(
-            {
-                "type": "text",
-                "text": "\n## Current Input Images:\n",
-            }
+        parts.extend(
+            "- [%s msg_id %s] %s" % (_SENDER_PREFIX.get(sender, "System"), id_, text)
+            for id_, sender, text in previous_messages
         )
-        for img in new_images:
-            user_message_block["content"].append(
-                {"type": "image_url", "image_url": {"url": img["url"]}}
-            )
 
     # ✍ Current input
-    user_message_block["content"].append(
-        {"type": "text", "text": "\n## Current Input Message:"}
-    )
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": f"- {current_message}",
-        }
-    )
+    parts.append("\n## Current Input Message:")
+    parts.append(f"- {current_message}")
 
     # 📤 Response instruction
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": (
-                "\n## Output Format\n"
-                "Respond ONLY in this JSON format:\n\n"
-                "json\n"
-                "{\n"
-                '  "backend": {\n'
-                '    "session_title": "null" or "A descriptive title based on the overall user\'s condition (e.g., Lumbar Spine Degeneration)",\n'
-                '    "is_diagnosed": true or false,\n'
-                '    "irrelevant_message_ids": [],\n'
-                '    "irrelevant_image_ids": [],\n'
-                '    "multiple_region_detected": true or false,\n'
-                '    "images_summary": [\n'
-                '      "Image 1 (X-ray, Cervical Spine): Overall impression: Mild degenerative changes. Findings: Loss of normal cervical lordosis, mild C5-C6 disc space narrowing. Keywords: lordosis, disc degeneration.",\n'
-                '      "Image 2 (MRI, Lumbar Spine): Overall impression: Significant L4-L5 disc herniation. Findings: Large central disc extrusion at L4-L5, moderate spinal canal stenosis. Keywords: herniation, stenosis, lumbar, MRI."\n'
-                "    ], // Array of detailed string summaries, each representing one image summary.\n"
-                '    "findings": {\n'
-                '      "Cervical Spine (Neck) Findings": ["Loss of cervical lordosis", "Facet joint hypertrophy"],\n'
-                '      "Thoracic Spine (Mid-Back) Findings": [],\n'
-                '      "Lumbar Spine (Lower Back) Findings": ["Loss or reversal of lumbar lordosis", "Scoliosis"]\n'
-                "      // ... other spine section findings as observed, prioritizing terms from the system prompt\n"
-                "    } or null, // null if diagnosis not yet possible\n"
-                '    "recommendations": {\n'
-                '      "Exercise": [\n'
-                '        "Strengthening exercises for the back muscles",\n'
-                '        "Gentle stretching for improved flexibility"\n'
-                "      ],\n"
-                '      "Pain Relief": [],\n'
-                '      "Ice & Heat": [],\n'
-                '      "Inflammation Management": [],\n'
-                '      "Lifestyle Adjustments": [],\n'
-                '      "Therapies": [],\n'
-                '      "Breathing & Core Techniques": [],\n'
-                '      "Daily Habits": [],\n'
-                '      "Natural Remedies Strength": []\n'
-                "      // ... other recommendations categories\n"
-                "    } or null // null if diagnosis not yet possible\n"
-                "  },\n"
-                '  "user": "<markdown explanation and questions for the patient>"\n'
-                "}\n"
-                "\n\n"
-                "Crucially, for the 'findings' section, aim to use the specific phrases provided in the system prompt. "
-                "If a finding is clearly observed but not on the list, you may describe it concisely. "
-                "Leave 'findings' and 'recommendations' as null if identifying the condition isn't yet possible. "
-                "The 'session_title' should also be null if the condition has not been identified."
-            ),
-        }
-    )
+    parts.append(_SPINE_OUTPUT_FORMAT)
+
+    # 🖼 New images are attached right after the text that introduces them
+    if new_images:
+        parts.append("\n## Current Input Images:")
 
-    # 🧩 Add full user message block to messages list
-    messages.append(user_message_block)
+    content = [{"type": "text", "text": "\n".join(parts)}]
+    if new_images:
+        content.extend(
+            {"type": "image_url", "image_url": {"url": img["url"]}}
+            for img in new_images
+        )
+
+    messages.append({"role": "user", "content": content})
     return messages
 
 
@@ -403,476 +314,131 @@ def build_post_diagnosis_prompt(
     user: Dict,  # {"name": "Omar"}
     findings: Dict,
     recommendations: Dict,
-    previous_messages: List[Dict],  # [{"sender": "user"/"ai", "text": str}]
+    previous_messages: List[Tuple[str, str]],  # [(sender, text)], "user"/"system"
     current_message: Dict,  # {"id": int, "text": str}
+    findings_md: Optional[str] = None,
+    recommendations_md: Optional[str] = None,
+    system_message: Dict = _POST_DIAGNOSIS_SYSTEM_MESSAGE,
 ) -> List[Dict]:
-    today = datetime.now().strftime("%Y-%m-%d")
     """
     Constructs OpenAI-compatible messages[] for post-diagnosis AI use.
 
+    ``findings_md``/``recommendations_md`` are the Markdown renderings stored
+    on the session at write time; when missing (rows diagnosed before they
+    were stored), the JSON is formatted here instead. ``system_message``
+    selects the plan's static system prompt (see free_helpers).
+
     Returns:
         List[Dict]: messages for openai.ChatCompletion.create(...)
     """
+    today = datetime.now().strftime("%Y-%m-%d")
 
-    def format_findings_md(findings: Dict) -> str:
-        parts = []
-        for key, value in findings.items():
-            title = key.replace("_", " ").title()
-            if isinstance(value, dict):
-                parts.append(f"### 🦴 {title}")
-                for sub_key, sub_value in value.items():
-                    parts.append(f"- {sub_key.replace('_', ' ').title()}: {sub_value}")
-            elif isinstance(value, list):
-                parts.append(f"### 📌 {title}")
-                parts.extend([f"- {v}" for v in value])
-            elif isinstance(value, str):
-                parts.append(f"### 📌 {title}\n- {value}")
-        return "\n".join(parts) or "No diagnosis data available."
-
-    def format_recommendations_md(recommendations: Dict) -> str:
-        if not recommendations:
-            return "No previous recommendations available."
-        out = []
-        for key, values in recommendations.items():
-            title = key.replace("_", " ").title()
-            if isinstance(values, list):
-                formatted = (
-                    "\n".join([f"   - {v}" for v in values])
-                    if values
-                    else "   - None provided"
-                )
-            elif isinstance(values, str):
-                formatted = f"   - {values}" if values.strip() else "   - None provided"
-            else:
-                formatted = "   - Unknown format"
-            out.append(f"- {title}:\n{formatted}")
-        return "\n".join(out)
-
-    # 🧠 1. System message
+    # 🧠 1. Static system message, identical for every user
+    # 📄 2. Session context: stable across a session's turns, so it extends the
+    # cached prefix; only the user message below changes per turn.
+    context = "\n".join(
+        [
+            # 📄 Patient info
+            f"Patient: {user.get('name', 'Patient')}\nSession ID: {session_id}",
+            # 📊 Findings
+            "\n### 🧾 Previous Diagnosis:\n"
+            + (findings_md or format_findings_md(findings)),
+            # ✅ Recommendations
+            "\n### ✅ Previous Recommendations:\n"
+            + (recommendations_md or format_recommendations_md(recommendations)),
+        ]
+    )
     messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are an AI medical assistant specialized in spine-related diagnosis and long-term patient care. If some one ask what model you are or your name just say spine ai. Never do direct diagnosis before gatharing enough information by asking quastions.\n\n"
-                "The patient has already been diagnosed. Your responsibilities now include:\n"
-                "1. Reviewing the patient's previous diagnosis and recommendations.\n"
-                "2. Answering their follow-up questions and concerns clearly and professionally.\n"
-                "3. If appropriate, updating the previous recommendations based on:\n"
-                "   - Progress or lack of progress\n"
-                "   - New symptoms reported\n"
-                "   - Behavioral changes mentioned\n"
-                "4. If the user requests a report, generate a medical-style progress report using the previous findings and updated recommendations. Format it clearly in proper markdown, following the structured template below for spine X-ray reports, adapted to the specific spine region (cervical, thoracic, or lumbar) relevant to the patient's condition. Include a report title based on the spine region (e.g., 'Cervical Spine X-Ray Report'). \n\n"
-                "**Spine X-Ray Report Template (for the report field when requested):\n"
-                "markdown\n"
-                "\n# [CERVICAL/THORACIC/LUMBAR] SPINE X-RAY REPORT\n\n"
-                "Patient Name: [Patient Name]\n"
-                f"Date of Exam: [{today}]\n"
-                "Indication: [e.g., Neck pain, Low back pain, Trauma, etc.]\n"
-                "Technique: [e.g., AP, lateral, and (oblique / open-mouth odontoid / flexion-extension) views of the [cervical/thoracic/lumbar] spine]\n\n"
-                "## FINDINGS\n\n"
-                "### Alignment and Curvature\n"
-                "- [e.g., Cervical lordosis is (normal / straightened / reversed / kyphotic) or Thoracic kyphosis is (normal / increased / decreased) or Lumbar lordosis is (normal / decreased / reversed)]\n"
-                "- Vertebral alignment is (maintained / disrupted), with (no evidence / evidence) of spondylolisthesis [e.g., Grade ___ anterolisthesis of ___ over ___ for lumbar].\n"
-                "- [For thoracic: Scoliosis noted, Cobb angle ___ (if applicable)].\n\n"
-                "### Vertebral Bodies\n"
-                "- Vertebral body heights are (maintained / mild wedging / compression at [level]).\n"
-                "- No evidence of fracture, lytic, or blastic lesion.\n"
-                "- Bone mineral density appears (normal / decreased).\n\n"
-                "### Intervertebral Disc Spaces\n"
-                "- Disc spaces are (preserved / narrowed at [level]).\n"
-                "- [e.g., Endplate sclerosis and osteophytes consistent with (mild / moderate / severe) degenerative disc disease or Schmorl's nodes noted at [level] for thoracic].\n"
-                "- Vacuum phenomenon: (Present / Not present).\n\n"
-                "### Facet Joints and Posterior Elements\n"
-                "- Facet joints are (normal / degenerative at [level]).\n"
-                "- No evidence of pars defect or posterior element fracture [or Pars interarticularis defect seen at [level] bilaterally/unilaterally — spondylolysis for lumbar].\n\n"
-                "### [For Cervical: Odontoid & Atlantoaxial Complex]\n"
-                "- Odontoid is (intact / fractured).\n"
-                "- C1-C2 alignment is (normal / widened at atlantodental interval suggesting instability).\n\n"
-                "### [For Lumbar: Pelvis and Sacrum]\n"
-                "- Sacroiliac joints are (normal / show sclerosis / narrowing).\n"
-                "- Transitional anatomy noted at [e.g., lumbarization or sacralization] (if applicable).\n\n"
-                "### Soft Tissues\n"
-                "- [e.g., Prevertebral soft tissues are (normal / widened, suggestive of trauma or infection) for cervical or Paraspinal lines and visible soft tissues are unremarkable for thoracic].\n"
-                "- Abdominal aortic calcification noted / not seen.\n\n"
-                "### Other Findings\n"
-                "- [e.g., No cervical ribs / Cervical ribs noted bilaterally / unilaterally or Spina bifida occulta noted at [level] or Block vertebra noted at [level]].\n\n"
-                "## IMPRESSION\n"
-                "1. [e.g., [Cervical/Thoracic/Lumbar] spine with (normal alignment / mild degenerative change at [level])]\n"
-                "2. [e.g., No acute fracture or subluxation]\n"
-                "3. [e.g., Recommend clinical correlation or advanced imaging if symptoms persist]\n"
-                "\n\n"
-                "Never attempt to re-diagnose symptoms or images.\n\n"
-                "After diagnosing, ask: 'Would you like specific exercises or habits that you should do, or how to maintain a good spine posture, or recommend products based on your conditions, or want to learn some daily habits that can ease your discomfort and support recovery?'\n\n"
-                "Also, inform the user: 'Please check the left side of the screen for your treatment plan and product suggestions. If you have bought our elite plan you'll get personalized treatment plans based on your conditions. If you don't see your treatment plan and products recomendations stright away then please wait a few minutes the AI is working on it.'\n\n"
-                "Additionally, ask the user: 'Would you like a formal progress report or guide, or help with what to do next? Or let me know if you'd like a status update, next steps, or have any questions?'\n\n"
-                "Respond in the following JSON format ONLY:\n\n"
-                "{\n"
-                '  "updated_recommendations": {\n'
-                '    "lifestyle": ["..."],\n'
-                '    "exercise": ["..."],\n'
-                '    "diet": ["..."],\n'
-                '    "followup": "..."\n'
-                "  },\n"
-                '  "user": "### Markdown-formatted response to show the patient",If a report is requested, this field MUST contain the full markdown-formatted report as per the Spine X-Ray Report Template. Otherwise, provide a conversational response.",\n'
-                '  "report_title": "[e.g., Cervical Spine X-Ray Report, Thoracic Spine X-Ray Report, or Lumbar Spine X-Ray Report]",\n'
-                '  "report": "### Markdown-formatted ** Only The Report Part** to store in the database if user asked for report else omit this key"\n'
-                "}\n\n"
-                "If no recommendations have changed, omit updated_recommendations.\n"
-                "Always include the user markdown response.\n"
-                "When generating the report, fill in the template with specific findings relevant to the patient's condition, ensuring accuracy and consistency with prior diagnoses. Include the report_title key only when a report is requested, specifying the spine region addressed (e.g., 'Cervical Spine X-Ray Report').\n"
-                " - Make sure to never give users any external links to other websites if they ask you about exercises or treatment plans or products.\n"
-                " - Just suggest products and recommendations as it is but never ever give any external websites link.\n"
-                " - Instead if they insist you'll give them this link \"https://stage.online-spine.com/dashboard/treatments\" for treatment plans and exercises.\n"
-                " - And this link \"https://stage.online-spine.com/dashboard/products\" for products recommendations.\n"
-                " - If they insist on giving suggestions about something that you have to give the user an external website link in that case you'll say sorry it's not in my capability you should consult a doctor for further information."
-            ),
-        }
+        system_message,
+        {"role": "system", "content": context},
     ]
 
-    # 🗣 2. User context message
-    user_message_block = {"role": "user", "content": []}
-
-    # 📄 Patient info
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": f"Patient: {user.get('name', 'Patient')}\nSession ID: {session_id}",
-        }
-    )
+    # 🗣 3. User message, sent as a single text part
+    parts = [f"Today's date: {today}"]
 
-    # 📊 Findings
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": "\n### 🧾 Previous Diagnosis:\n" + format_findings_md(findings),
-        }
-    )
-
-    # ✅ Recommendations
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": "\n### ✅ Previous Recommendations:\n"
-            + format_recommendations_md(recommendations),
-        }
-    )
-
-    # 💬 Previous related memory messages
+    # 💬 Previous related memory messages, one line each in the same text
     if previous_messages:
-        user_message_block["content"].append(
-            {
-                "type": "text",
-                "text": "\n### 🧠 Related Messages from Past Conversation:",
-            }
+        parts.append("\n### 🧠 Related Messages from Past Conversation:")
+        parts.extend(
+            "- [%s] %s" % (_SENDER_PREFIX.get(sender, "system"), text)
+            for sender, text in previous_messages
         )
-        for msg in previous_messages:
-            prefix = "User" if msg["sender"] == "user" else "system"
-            user_message_block["content"].append(
-                {"type": "text", "text": f"- [{prefix}] {msg['text']}"}
-            )
 
     # ✍ Current patient input
-    user_message_block["content"].append(
-        {"type": "text", "text": "\n### 💬 Patient's New Message:"}
-    )
-    user_message_block["content"].append(
-        {"type": "text", "text": f"- [User {current_message}]"}
-    )
+    parts.append("\n### 💬 Patient's New Message:")
+    parts.append(f"- [User {current_message}]")
 
     # Add to full message list
-    messages.append(user_message_block)
+    messages.append(
+        {"role": "user", "content": [{"type": "text", "text": "\n".join(parts)}]}
+    )
     return messages
 
 
-def generate_treatment_plan_prompt(findings, recommendations, date: str):
-
-    def format_findings_md(findings: Dict) -> str:
-        parts = []
-        for key, value in findings.items():
-            title = key.replace("_", " ").title()
-            if isinstance(value, dict):
-                parts.append(f"### 🦴 {title}")
-                for sub_key, sub_value in value.items():
-                    parts.append(f"- {sub_key.replace('_', ' ').title()}: {sub_value}")
-            elif isinstance(value, list):
-                parts.append(f"### 📌 {title}")
-                parts.extend([f"- {v}" for v in value])
-            elif isinstance(value, str):
-                parts.append(f"### 📌 {title}\n- {value}")
-        return "\n".join(parts) or "No diagnosis data available."
-
-    def format_recommendations_md(recommendations: Dict) -> str:
-        if not recommendations:
-            return "No previous recommendations available."
-        out = []
-        for key, values in recommendations.items():
-            title = key.replace("_", " ").title()
-            if isinstance(values, list):
-                formatted = (
-                    "\n".join([f"   - {v}" for v in values])
-                    if values
-                    else "   - None provided"
-                )
-            elif isinstance(values, str):
-                formatted = f"   - {values}" if values.strip() else "   - None provided"
-            else:
-                formatted = "   - Unknown format"
-            out.append(f"- {title}:\n{formatted}")
-        return "\n".join(out)
+def prompt_cache_key(session_id) -> str:
+    """
+    Returns the OpenAI prompt_cache_key for a chat session.
 
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a highly experienced, medically-informed, expert medical assistant designed for patients with spinal concerns. Your job is to make treatment plans in the given format based on the findings and recommendations.\n"
-                "This is the format you'll make the treatment plan which is json format and you'll never response anything else other than just the json part with the generated info.\n"
-                "Under the 'treatment' object, generate plans for the categories **that are directly relevant and appropriate for the patient's specific condition and severity**. Select from the following categories: 'Exercise', 'Movement Therapy', 'Pain Relief', 'Ice & Heat', 'Inflammation Management', 'Lifestyle Adjustments', 'Therapies', 'Breathing & Core Techniques', 'Daily Habits', 'Natural Remedies', 'Strength'. **Crucially, ensure the selected categories and the content within each plan are strictly proportionate to the condition, avoiding any excessive or unneeded treatments.**\n"
-                "For EACH *selected and relevant* category, you MUST provide a detailed plan broken down into 4 distinct weeks (Week-1, Week-2, Week-3, Week-4).\n"
-                "Each week MUST include specific daily tasks, planned for **3 distinct dates within that week**, clearly specifying the exact dates for each task. The treatment plan starts from the given 'start_date'.\n"
-                "Make sure the treatment plan is detailed and filled with perfect, **condition-appropriate, progressive, and non-excessive** instructions. The categories included will vary based on the patient's specific condition, but the overarching format (4 distinct weeks per category, with tasks scheduled for 3 specific dates per week) must remain consistent. **Your priority is to provide effective, targeted interventions that are precisely relevant to the diagnosed condition, always avoiding unnecessary, overly aggressive, or superfluous treatments.**\n"
-            ),
-        }
-    ]
-    user_message_block = {"role": "user", "content": []}
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": f"### 📅 Date:\n {date}",
-        }
-    )
-    # 📊 Findings
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": "\n### 🧾 Previous Diagnosis or Findings:\n"
-            + format_findings_md(findings),
-        }
-    )
-    # ✅ Recommendations
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": "\n### ✅ Previous Recommendations:\n"
-            + format_recommendations_md(recommendations),
-        }
-    )
+    Turns of one session share a key, so they are routed to where that
+    session's prompt prefix is already cached. The id is hashed so the raw
+    session id isn't sent to the provider.
+    """
+    return hashlib.sha256(str(session_id).encode()).hexdigest()[:32]
 
-    # Output Format:
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": "\n### 📝 Treatment Plan Example (showing 4 distinct weeks for EACH category):\n"
-            + "```json\n"
-            + "{\n"
-            + '    "treatment": {\n'
-            + '        "exercise": [\n'
-            + "            {\n"
-            + '                "name": "Week-1",\n'
-            + '                "description": "Introductory exercises focusing on gentle mobility.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Neck Tilts",\n'
-            + '                        "description": "Slowly tilt head to each shoulder, 5 reps per side.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    },\n"
-            + "                    {\n"
-            + '                        "title": "Shoulder Rolls",\n'
-            + '                        "description": "Roll shoulders forward and backward, 10 reps each direction.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-2",\n'
-            + '                "description": "Gradually increasing range of motion and light strengthening.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Chin Tucks",\n'
-            + '                        "description": "Gently pull chin towards chest, holding for 5 seconds, 10 reps.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-3",\n'
-            + '                "description": "Focus on muscle endurance and stability.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Wall Slides",\n'
-            + '                        "description": "Stand against a wall, slide arms up and down, 10 reps.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    },\n"
-            + "                    {\n"
-            + '                        "title": "Resistance Band Pulls",\n'
-            + '                        "description": "Light resistance band exercises for upper back, 15 reps.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-4",\n'
-            + '                "description": "Advanced exercises and integration into daily routine.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Light Dumbbell Rows",\n'
-            + '                        "description": "Perform rows with light dumbbells (2-3 lbs), 12 reps.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            }\n"
-            + "        ],\n"
-            + '        "movement_therapy": [\n'
-            + "            {\n"
-            + '                "name": "Week-1",\n'
-            + '                "description": "Gentle movements to improve flexibility and reduce stiffness.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Cat-Cow Stretch",\n'
-            + '                        "description": "Perform on hands and knees, flowing between arched and rounded back, 8 reps.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-2",\n'
-            + '                "description": "Expanding range of motion with controlled movements.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Thoracic Rotations",\n'
-            + '                        "description": "Seated rotations to improve upper back mobility, 10 reps per side.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-3",\n'
-            + '                "description": "Integrating functional movements.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Arm Circles",\n'
-            + '                        "description": "Small, controlled arm circles forward and backward, 15 reps each direction.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-4",\n'
-            + '                "description": "Reinforcing proper movement patterns in daily activities.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Mindful Posture Checks",\n'
-            + '                        "description": "Regularly check and correct posture while sitting, standing, and walking.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            }\n"
-            + "        ],\n"
-            + '        "pain_relief": [\n'
-            + "            {\n"
-            + '                "name": "Week-1",\n'
-            + '                "description": "Initial pain management strategies.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Cold Compress",\n'
-            + '                        "description": "Apply cold pack to affected area for 15-20 minutes, 2-3 times a day, to reduce inflammation.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-2",\n'
-            + '                "description": "Continuing pain management with introduction of heat.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Moist Heat Application",\n'
-            + '                        "description": "Apply moist heat for 15-20 minutes, 1-2 times a day, before exercises to relax muscles.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-3",\n'
-            + '                "description": "Managing lingering pain and preventing flare-ups.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Topical Pain Relief Cream",\n'
-            + '                        "description": "Apply over-the-counter pain relief cream as needed for localized discomfort.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            },\n"
-            + "            {\n"
-            + '                "name": "Week-4",\n'
-            + '                "description": "Long-term pain prevention and self-management.",\n'
-            + '                "startDate": "YYYY-MM-DD",\n'
-            + '                "endDate": "YYYY-MM-DD",\n'
-            + '                "task": [\n'
-            + "                    {\n"
-            + '                        "title": "Mind-Body Relaxation",\n'
-            + '                        "description": "Practice meditation or deep breathing to manage pain perception, 10 minutes daily.",\n'
-            + '                        "date": "YYYY-MM-DD",\n'
-            + '                        "status": "pending"\n'
-            + "                    }\n"
-            + "                ]\n"
-            + "            }\n"
-            + "        ]\n"
-            + "        // ... and so on for all other relevant categories, each with 4 distinct weeks ...\n"
-            + "    }\n"
-            + "}\n"
-            + "```\n",
-        }
-    )
-    messages.append(user_message_block)
-    return messages
 
+@cache
+def _treatment_prompt() -> Tuple[Dict, str]:
+    """
+    Loads the treatment-plan system message and example on first use.
 
-def generate_product_recommendation_prompt(findings: dict) -> str:
+    Only the Celery worker builds treatment plans, so web workers never read
+    these resources. The result is cached and shared across calls.
     """
-    Generates a product recommendation prompt in JSON format based on medical findings.
+    system_message = {"role": "system", "content": load_prompt("treatment_system.md")}
+    example_text = (
+        "\n### 📝 Treatment Plan Example (showing 4 distinct weeks for EACH category):\n"
+        "```json\n"
+        + load_prompt("treatment_example.json")
+        + "\n```\n"
+        "The example shows three categories; continue the same way for all other "
+        "relevant categories, each with 4 distinct weeks.\n"
+    )
+    return system_message, example_text
 
-    Args:
-        findings (str): A string containing the medical findings.
 
-    Returns:
-        str: A JSON string containing relevant product recommendation tags.
+def generate_treatment_plan_prompt(
+    findings, recommendations, date: str
+) -> Tuple[Dict, ...]:
     """
+    Builds the treatment plan messages as an immutable tuple; the system
+    message dict is shared across calls and must not be mutated.
+    """
+    system_message, example_text = _treatment_prompt()
+    diagnosis = format_findings_md(findings)
+    previous_recommendations = format_recommendations_md(recommendations)
+    parts = [
+        f"### 📅 Date:\n {date}",
+        # 📊 Findings
+        "\n### 🧾 Previous Diagnosis or Findings:\n" + diagnosis,
+        # ✅ Recommendations
+        "\n### ✅ Previous Recommendations:\n" + previous_recommendations,
+        # Output Format:
+        example_text,
+    ]
+    return (
+        system_message,
+        {"role": "user", "content": [{"type": "text", "text": "\n".join(parts)}]},
+    )
+
+
+async def generate_treatment_plan_prompt_async(*args, **kwargs):
+    """Builds the treatment plan prompt in a worker thread, off the event loop."""
+    return await asyncio.to_thread(generate_treatment_plan_prompt, *args, **kwargs)
 
-    available_tags = {
+
+# Tags the product recommender may answer with
+_PRODUCT_TAGS: Final = frozenset(
+    {
         "Abdominal aortic calcification",
         "Abnormal kyphosis",
         "Ankylosis",
@@ -943,68 +509,68 @@ def generate_product_recommendation_prompt(findings: dict) -> str:
         "Uncovertebral joint degeneration",
         "Vacuum phenomenon",
     }
+)
+
+# Sorted so the prompt text, and so the provider's prompt cache, is stable
+# across processes regardless of set iteration order.
+_PRODUCT_SYSTEM_MESSAGE: Final = {
+    "role": "system",
+    "content": (
+        "You are a highly experienced, medically-informed, expert medical assistant designed for patients "
+        "with spinal, neck, or musculoskeletal concerns. Your job is to response tags for product "
+        "recommendation in the given format based on the findings.\n\n"
+        "This is the format you'll response the tags which is in json format and you'll never "
+        "response anything else other than just the json part with the generated info.\n\n"
+        "Here are the tags that i have and you'll only response with these tags for product recommendation = "
+        f"{json.dumps(sorted(_PRODUCT_TAGS))}\n\n"  # Outputting as a JSON array of strings
+        "And under the tags object you'll just output the tags that are given to you and nothing else\n"
+        "Make sure that the format doesn't and add as many tags you need according to the findings"
+    ),
+}
 
-    def format_findings_md(findings: Dict) -> str:
-        parts = []
-        for key, value in findings.items():
-            title = key.replace("_", " ").title()
-            if isinstance(value, dict):
-                parts.append(f"### 🦴 {title}")
-                for sub_key, sub_value in value.items():
-                    parts.append(f"- {sub_key.replace('_', ' ').title()}: {sub_value}")
-            elif isinstance(value, list):
-                parts.append(f"### 📌 {title}")
-                parts.extend([f"- {v}" for v in value])
-            elif isinstance(value, str):
-                parts.append(f"### 📌 {title}\n- {value}")
-        return "\n".join(parts) or "No diagnosis data available."
 
-    # Construct the prompt similar to the example
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a highly experienced, medically-informed, expert medical assistant designed for patients "
-                "with spinal, neck, or musculoskeletal concerns. Your job is to response tags for product "
-                "recommendation in the given format based on the findings.\n\n"
-                "This is the format you'll response the tags which is in json format and you'll never "
-                "response anything else other than just the json part with the generated info.\n\n"
-                "Here are the tags that i have and you'll only response with these tags for product recommendation = "
-                f"{json.dumps(list(available_tags))}\n\n"  # Outputting as a JSON array of strings
-                "And under the tags object you'll just output the tags that are given to you and nothing else\n"
-                "Make sure that the format doesn't and add as many tags you need according to the findings"
-            ),
-        }
-    ]
+def generate_product_recommendation_prompt(findings: dict) -> str:
+    """
+    Generates a product recommendation prompt in JSON format based on medical findings.
 
-    user_message_block = {"role": "user", "content": []}
+    Args:
+        findings (str): A string containing the medical findings.
 
-    user_message_block["content"].append(
-        {
-            "type": "text",
-            "text": f"### 🧾 Findings:\n" + format_findings_md(findings),
-        }
-    )
+    Returns:
+        str: A JSON string containing relevant product recommendation tags.
+    """
 
-    # Output Format:
-    user_message_block["content"].append(
+    # Construct the prompt similar to the example
+    messages = [_PRODUCT_SYSTEM_MESSAGE]
+
+    # The user turn is a fixed two-part block, so build it in one literal rather
+    # than growing an empty dict part by part.
+    messages.append(
         {
-            "type": "text",
-            "text": (
-                "\n### 📝 Product Recommendation Format Example:\n"
-                "```json\n"
-                "{\n"
-                '  "product_tags": [\n'
-                '    "tag1",\n'
-                '    "tag2",\n'
-                '    "tag3",\n'
-                '    "tag4"\n'
-                "  ]\n"
-                "}\n"
-                "```\n"
-            ),
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": "### 🧾 Findings:\n" + format_findings_md(findings),
+                },
+                # Output Format:
+                {
+                    "type": "text",
+                    "text": (
+                        "\n### 📝 Product Recommendation Format Example:\n"
+                        "```json\n"
+                        "{\n"
+                        '  "product_tags": [\n'
+                        '    "tag1",\n'
+                        '    "tag2",\n'
+                        '    "tag3",\n'
+                        '    "tag4"\n'
+                        "  ]\n"
+                        "}\n"
+                        "```\n"
+                    ),
+                },
+            ],
         }
     )
-
-    messages.append(user_message_block)
     return messages
\ No newline at end of file
@@ -0,0 +1,18 @@
+import re
+from functools import cache
+from importlib.resources import files
+
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+@cache
+def load_prompt(name: str) -> str:
+    """
+    Read a prompt resource bundled in this package.
+
+    Trailing whitespace is stripped from every line and runs of blank lines are
+    collapsed to one, so the text shipped to the model carries no dead bytes.
+    """
+    text = (files(__name__) / name).read_text(encoding="utf-8")
+    text = "\n".join(line.rstrip() for line in text.splitlines())
+    return _BLANK_RUNS.sub("\n\n", text).strip("\n")
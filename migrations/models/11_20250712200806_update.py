@@ -3,11 +3,13 @@ from tortoise import BaseDBAsyncClient
 
 async def upgrade(db: BaseDBAsyncClient) -> str:
     return """
-        ALTER TABLE "images" ADD "file_type" VARCHAR(10);
-        ALTER TABLE "images" ADD "meta_data" JSONB;"""
+        ALTER TABLE "images"
+            ADD "file_type" VARCHAR(10),
+            ADD "meta_data" JSONB;"""
 
 
 async def downgrade(db: BaseDBAsyncClient) -> str:
     return """
-        ALTER TABLE "images" DROP COLUMN "file_type";
-        ALTER TABLE "images" DROP COLUMN "meta_data";"""
+        ALTER TABLE "images"
+            DROP COLUMN "file_type",
+            DROP COLUMN "meta_data";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_messages_session_created" ON "messages" ("session_id", "created_at" DESC);
+        CREATE INDEX IF NOT EXISTS "idx_sessions_user_created" ON "sessions" ("user_id", "created_at" DESC);
+        CREATE INDEX IF NOT EXISTS "idx_images_message" ON "images" ("message_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_messages_session_created";
+        DROP INDEX IF EXISTS "idx_sessions_user_created";
+        DROP INDEX IF EXISTS "idx_images_message";"""
@@ -0,0 +1,11 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "sessions" ADD "findings_md" TEXT, ADD "recommendations_md" TEXT;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "sessions" DROP COLUMN "findings_md", DROP COLUMN "recommendations_md";"""
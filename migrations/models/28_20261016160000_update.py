@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "usages" DROP COLUMN "updated_at";
+        ALTER TABLE "pending_stripe_events" DROP COLUMN "updated_at";
+        CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS TRIGGER AS $$
+        BEGIN
+            NEW."updated_at" = CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER "trg_messages_touch_updated_at" BEFORE UPDATE ON "messages" FOR EACH ROW EXECUTE PROCEDURE touch_updated_at();"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TRIGGER IF EXISTS "trg_messages_touch_updated_at" ON "messages";
+        DROP FUNCTION IF EXISTS touch_updated_at();
+        ALTER TABLE "usages" ADD "updated_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE "pending_stripe_events" ADD "updated_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP;"""